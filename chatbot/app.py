@@ -1,7 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from chatbot import get_sales_ai_response
+from chatbot import enrichment_queue, get_sales_ai_response
+from llm_cache import response_cache
+from maintenance import MAINTENANCE_INTERVAL, start_background_maintenance
+import profiling
+from concurrent.futures import ThreadPoolExecutor
+import hmac
+import json
 import logging
+import os
+import queue
 import uuid
 
 # Initialize Flask app
@@ -15,6 +23,26 @@ CORS(app, resources={r"/*": {"origins": "https://servyy-ai-fe.netlify.app"}})
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bounded pool shared by all /chat/batch requests
+BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "100"))
+BATCH_WORKERS = int(os.getenv("CHAT_BATCH_WORKERS", "8"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="chat-batch")
+
+
+def start_background_workers():
+    """Start prospect enrichment and, if configured, chat history maintenance."""
+    enrichment_queue.start(backfill=True)
+    # Archive/compact chat history in the background when CHAT_MAINTENANCE_INTERVAL is set
+    if MAINTENANCE_INTERVAL > 0:
+        start_background_maintenance(MAINTENANCE_INTERVAL)
+
+
+# Imported by a WSGI server, or the serving child of the debug reloader; the
+# reloader's watcher process never handles requests and runs no workers
+if __name__ != '__main__' or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    start_background_workers()
+
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """
@@ -66,6 +94,122 @@ def chat():
         return jsonify({"error": "Internal server error occurred", "status": "error"}), 500
 
 
+def run_user_items(user_id: str, items: list, results: queue.Queue):
+    """Process one user's batch items in order, reporting each as it finishes."""
+    for index, message in items:
+        try:
+            ai_response = get_sales_ai_response(message, user_id)
+            results.put({"index": index, "user_id": user_id, "status": "success", "response": ai_response})
+        except Exception as e:
+            logger.error(f"Error processing batch item {index} for user {user_id}: {str(e)}")
+            results.put({"index": index, "user_id": user_id, "status": "error", "error": "Internal server error occurred"})
+
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Process many independent chat messages concurrently
+
+    Expected JSON body:
+    {
+        "items": [{"message": "...", "user_id": "optional"}, ...]
+    }
+
+    Streams one JSON object per line (application/x-ndjson) as items complete:
+    {"index": 0, "user_id": "...", "status": "success", "response": "AI response"}
+    {"index": 1, "user_id": "...", "status": "error", "error": "..."}
+    followed by a final {"status": "complete", "succeeded": n, "failed": m}.
+    Items for the same user_id run in request order; different users run in parallel.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('items'), list) or not data['items']:
+        return jsonify({"error": "Missing 'items' list", "status": "error"}), 400
+    if len(data['items']) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Batch is limited to {BATCH_MAX_ITEMS} items", "status": "error"}), 400
+
+    # Validate up front; invalid items are reported without running anything
+    rejected = []
+    items_by_user = {}
+    for index, item in enumerate(data['items']):
+        message = item.get('message') if isinstance(item, dict) else None
+        if not isinstance(message, str) or not message.strip():
+            rejected.append({"index": index, "status": "error", "error": "Missing or empty 'message' field"})
+            continue
+        user_id = str(item.get('user_id') or '').strip() or str(uuid.uuid4())
+        items_by_user.setdefault(user_id, []).append((index, message.strip()))
+
+    results = queue.Queue()
+    for user_id, user_items in items_by_user.items():
+        batch_executor.submit(run_user_items, user_id, user_items, results)
+    logger.info(f"Processing batch of {len(data['items'])} item(s) for {len(items_by_user)} user(s)")
+
+    def generate():
+        succeeded = failed = 0
+        for result in rejected:
+            failed += 1
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        for _ in range(len(data['items']) - len(rejected)):
+            result = results.get()
+            if result["status"] == "success":
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps({"status": "complete", "succeeded": succeeded, "failed": failed}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+def admin_error():
+    """Error response for a request to an admin endpoint, or None if it may proceed.
+
+    Admin endpoints are disabled unless ADMIN_TOKEN is configured, and then
+    require it in the X-Admin-Token header.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        return jsonify({"error": "Admin endpoints are disabled", "status": "error"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), admin_token):
+        return jsonify({"error": "Unauthorized", "status": "error"}), 401
+    return None
+
+
+@app.route('/admin/llm-cache', methods=['GET'])
+def llm_cache_stats():
+    """Hit rates and LLM calls saved by the tool response cache."""
+    error = admin_error()
+    if error:
+        return error
+    return jsonify({"cache": response_cache.stats(), "status": "success"}), 200
+
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def profiling_admin():
+    """
+    Allocation profiling per /chat phase
+
+    GET returns top allocation sites per phase and recent heap-growth reports.
+    POST {"enabled": true|false, "reset": true|false} switches profiling on/off
+    and optionally clears the collected results.
+    """
+    error = admin_error()
+    if error:
+        return error
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if data.get('reset'):
+            profiling.reset()
+        if 'enabled' in data:
+            if data['enabled']:
+                profiling.enable()
+            else:
+                profiling.disable()
+
+    top = request.args.get('top', default=profiling.TOP_SITES, type=int)
+    return jsonify({"profiling": profiling.report(top), "status": "success"}), 200
+
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found. Use POST /chat", "status": "error"}), 404
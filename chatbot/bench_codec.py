@@ -0,0 +1,109 @@
+# bench_codec.py
+"""
+Compare payload codecs on realistic conversations: stored size and
+encode/decode speed. Uses synthetic drafts/proposals by default, or real
+rows with --from-db.
+    python bench_codec.py --conversations 300 --turns 10
+"""
+import argparse
+import random
+import time
+
+from codec import CODECS, ZlibCodec, ZstdCodec, decode_payload, save_dictionary, train_dictionary, zstandard
+
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Health", "Stark Logistics", "Wayne Retail"]
+NAMES = ["John", "Priya", "Carlos", "Mei", "Fatima", "Liam"]
+SERVICES = ["web development", "digital marketing", "cloud migration", "data analytics"]
+
+
+def _draft(name: str, company: str, service: str) -> str:
+    return (
+        f"📧 **Cold Email Draft:**\nSubject: Helping {company} with {service}\n"
+        f"To: {name.lower()}@{company.split()[0].lower()}.com\n\n"
+        f"Hi {name},\n\nI hope this email finds you well. I noticed {company} has been growing quickly "
+        f"and wanted to reach out regarding our {service} services that could benefit your team.\n\n"
+        "We've helped similar companies reduce costs by 30% while improving delivery speed. "
+        "Would you be open to a 15-minute call next week to explore whether this could be a fit?\n\n"
+        "Best regards,\nSales Team\n\n📝 Use 'send cold email' to send via Gmail."
+    )
+
+
+def _proposal(company: str, service: str) -> str:
+    return (
+        f"📋 **SALES PROPOSAL**\nClient: {company}\nDate: {time.strftime('%B %d, %Y')}\n\n"
+        f"EXECUTIVE SUMMARY\nWe are pleased to present this proposal for {service}.\n\n"
+        f"PROPOSED SOLUTION\n{service}\n\nINVESTMENT\nBudget: To be discussed\n\n"
+        "NEXT STEPS\n1. Review and feedback on this proposal\n2. Schedule a detailed discussion\n"
+        "3. Finalize terms and timeline\n\nBest regards,\nYour Sales Team"
+    )
+
+
+def synthetic_conversation(turns: int, rng: random.Random) -> list:
+    conversation = []
+    for i in range(turns):
+        name, company, service = rng.choice(NAMES), rng.choice(COMPANIES), rng.choice(SERVICES)
+        if rng.random() < 0.6:
+            user, ai = f"Draft a cold email to {name} at {company} about {service}", _draft(name, company, service)
+        else:
+            user, ai = f"Create a proposal for {company} for {service}", _proposal(company, service)
+        conversation.append({"user": user, "ai": ai, "ts": f"2025-06-{1 + i % 28:02d} 10:00:00"})
+    return conversation
+
+
+def load_conversations(limit: int) -> list:
+    from db import get_store
+
+    conversations = []
+    for pool in get_store().pools:
+        with pool.connection() as conn:
+            rows = conn.execute("SELECT messages FROM conversations LIMIT ?", (limit,)).fetchall()
+        conversations.extend(decode_payload(row[0]) for row in rows)
+    return conversations
+
+
+def measure(codec, conversations: list):
+    started = time.perf_counter()
+    encoded = [codec.encode(conversation) for conversation in conversations]
+    encode_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for payload in encoded:
+        decode_payload(payload)
+    decode_time = time.perf_counter() - started
+
+    size = sum(len(payload.encode("utf-8") if isinstance(payload, str) else payload) for payload in encoded)
+    count = len(conversations)
+    return size, encode_time / count * 1e6, decode_time / count * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark conversation payload codecs.")
+    parser.add_argument("--conversations", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=10, help="turns per synthetic conversation")
+    parser.add_argument("--from-db", action="store_true", help="use conversations from the configured store")
+    parser.add_argument("--dict-dir", default="/tmp/bench_payload_dicts")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    # Train on a separate sample so the dictionary is not scored on its own training data
+    if args.from_db:
+        rows = load_conversations(args.conversations)
+        training, conversations = rows[::2], rows[1::2]
+    else:
+        training = [synthetic_conversation(args.turns, rng) for _ in range(200)]
+        conversations = [synthetic_conversation(args.turns, rng) for _ in range(args.conversations)]
+
+    codecs = [CODECS["json"](), ZlibCodec()]
+    codecs.append(ZlibCodec(save_dictionary(train_dictionary(training, codec_name="zlib"), args.dict_dir)))
+    if zstandard is not None:
+        codecs.append(ZstdCodec())
+        codecs.append(ZstdCodec(save_dictionary(train_dictionary(training, codec_name="zstd"), args.dict_dir)))
+
+    print(f"📊 {len(conversations)} conversation(s)")
+    print(f"{'codec':<14} {'bytes':>12} {'ratio':>7} {'encode µs':>11} {'decode µs':>11}")
+    baseline = None
+    for codec in codecs:
+        size, encode_us, decode_us = measure(codec, conversations)
+        baseline = baseline or size
+        label = codec.name + ("+dict" if getattr(codec, "dict_id", 0) else "")
+        print(f"{label:<14} {size:>12} {baseline / size:>6.1f}x {encode_us:>11.1f} {decode_us:>11.1f}")
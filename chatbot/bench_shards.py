@@ -0,0 +1,60 @@
+# bench_shards.py
+"""
+Benchmark concurrent save_turn throughput against shard count.
+
+Runs against throwaway databases in a temp directory, e.g.:
+    python bench_shards.py --shards 1 2 4 8 --threads 16 --turns 200
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from db import ConversationStore
+
+
+def run_benchmark(shard_count: int, threads: int, turns_per_thread: int, users: int, pool_size: int) -> float:
+    """Return save_turn calls per second for one shard configuration."""
+    workdir = tempfile.mkdtemp(prefix="chat_shards_")
+    store = ConversationStore(os.path.join(workdir, "chat_memory.db"), shard_count, pool_size)
+    ai_message = "Subject: Quick intro\n\nHi there, following up on our conversation. " * 5
+    start_barrier = threading.Barrier(threads + 1)
+
+    def worker(worker_id: int):
+        start_barrier.wait()
+        for i in range(turns_per_thread):
+            user_id = f"user-{(worker_id * turns_per_thread + i) % users}"
+            store.save_turn(user_id, f"Draft follow-up #{i}", ai_message)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    store.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return threads * turns_per_thread / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark save_turn throughput per shard count.")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=200, help="turns written per thread")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"📊 {args.threads} threads x {args.turns} turns over {args.users} users")
+    print(f"{'shards':>8} {'writes/s':>12} {'speedup':>9}")
+    baseline = None
+    for shard_count in args.shards:
+        rate = run_benchmark(shard_count, args.threads, args.turns, args.users, args.pool_size)
+        baseline = baseline or rate
+        print(f"{shard_count:>8} {rate:>12.1f} {rate / baseline:>8.2f}x")
@@ -14,6 +14,9 @@ from langchain.tools import tool, Tool
 from mail import job as send_email_job, create_email
 
 from db import save_turn, load_history
+from enrichment import EnrichmentQueue
+from llm_cache import response_cache
+import profiling
 from prospect_tool import add_prospect, get_prospect, update_prospect, list_all_prospects
 
 
@@ -56,6 +59,11 @@ search_tool = Tool(
     k=5
 )
 
+# Company research runs in the background when prospects are added, so the
+# agent can read it from get_prospect instead of searching mid-chat. The worker
+# is started by the entry points (app.py, start_sales_chat), not on import.
+enrichment_queue = EnrichmentQueue(search=serper.run)
+
 @tool  
 def send_cold_email(context: str) -> str:
     """Send a cold email using the provided context. Context should include recipient email and details."""
@@ -70,8 +78,8 @@ def send_cold_email(context: str) -> str:
         return f"❌ Failed to send email: {str(e)}"
 
 @tool
-def generate_cold_email_draft(context: str) -> str:
-    """Generate a cold email draft without sending it."""
+def generate_cold_email_draft(context: str, new_version: bool = False) -> str:
+    """Generate a cold email draft without sending it. Set new_version when the user asks for another or different draft."""
     context = sanitize_input(context)
     if not validate_content(context):
         return "❌ Content violates policy. Please revise."
@@ -79,9 +87,15 @@ def generate_cold_email_draft(context: str) -> str:
     try:
         draft_prompt = f"Create professional cold email for: {context}\n\nFormat:\nSubject: [subject]\nTo: [email]\n\n[message]"
         
-        response = llm.invoke([HumanMessage(content=draft_prompt)])
+        # Repeated draft requests are served from the response cache when enabled
+        draft_text = response_cache.get_or_call(
+            "generate_cold_email_draft",
+            draft_prompt,
+            lambda: llm.invoke([HumanMessage(content=draft_prompt)]).content,
+            refresh=new_version
+        )
         
-        draft = f"📧 **Cold Email Draft:**\n{response.content}\n\n📝 Use 'send cold email' to send via Gmail."
+        draft = f"📧 **Cold Email Draft:**\n{draft_text}\n\n📝 Use 'send cold email' to send via Gmail."
         return draft
     except Exception as e:
         return f"❌ Failed to generate email draft: {str(e)}"
@@ -176,17 +190,23 @@ Provider: ______________ Date: _______
 
 @tool
 def add_prospect_tool(name: str, email: str, company: str, details: str = "") -> str:
-    """Add a prospect to the SQLite database."""
-    return add_prospect(name, email, company, details)
+    """Add a prospect to the SQLite database. Company research starts automatically in the background."""
+    result = add_prospect(name, email, company, details)
+    if result.startswith("✅"):
+        enrichment_queue.enqueue(email, company)
+    return result
 
 @tool
 def get_prospect_tool(email: str) -> str:
-    """Retrieve prospect info from the SQLite database."""
+    """Retrieve prospect info from the SQLite database, including background company research when available."""
     return get_prospect(email)
 @tool
 def update_prospect_tool(email: str, name: str = None, company: str = None, details: str = None) -> str:
     """Update prospect info in the SQLite database."""
-    return update_prospect(email, name, company, details)
+    result = update_prospect(email, name, company, details)
+    if company and result.startswith("✅"):
+        enrichment_queue.enqueue(email, company)
+    return result
 @tool
 def list_all_prospects_tool() -> str:
     """List all prospects in the database."""
@@ -273,7 +293,8 @@ def get_sales_ai_response(user_input: str, user_id: str) -> str:
     
     
     # Load history from DB
-    chat_history = get_user_memory(user_id, limit=10)
+    with profiling.phase("history_load"):
+        chat_history = get_user_memory(user_id, limit=10)
     
     # Create messages list with system message, history, and current input
     messages = [SystemMessage(content=sales_ai_system)]
@@ -281,7 +302,8 @@ def get_sales_ai_response(user_input: str, user_id: str) -> str:
     messages.append(HumanMessage(content=user_input))
     
     # Get response from agent
-    response = agent.invoke({"messages": messages})
+    with profiling.phase("agent_run"):
+        response = agent.invoke({"messages": messages}, config=profiling.agent_config())
     
     # Extract AI response
     ai_response = ""
@@ -292,7 +314,8 @@ def get_sales_ai_response(user_input: str, user_id: str) -> str:
                 break
     
     # Save to memory
-    save_turn(user_id, user_input, ai_response)
+    with profiling.phase("save"):
+        save_turn(user_id, user_input, ai_response)
     
     return ai_response
 
@@ -316,6 +339,9 @@ def start_sales_chat():
     print("🔒 Security: Professional use only - No spam/fraud/illegal content")
     print("Type 'quit' to exit\n")
 
+    # Research prospects in the background while chatting
+    enrichment_queue.start(backfill=True)
+
     # Ask for user_id at start
     user_id = input("🔑 Enter your username (for chat history): ").strip()
     if not user_id:
@@ -0,0 +1,214 @@
+# codec.py
+"""
+Pluggable encodings for the conversation payloads stored by db.py.
+
+Legacy rows are JSON text. Encoded rows are binary frames:
+
+    b"SV" | codec id (1 byte) | dictionary id (4 bytes, 0 = none) | body
+
+where the body is compact UTF-8 JSON compressed with zlib or zstd, optionally
+primed with a shared dictionary trained on our own traffic. Reads accept every
+format, so the writing codec can be changed at any time without a migration.
+
+Train a dictionary from the current store:
+    python codec.py train
+then set CHAT_PAYLOAD_DICT_ID to the printed id. Dictionaries live in
+payload_dicts/ next to this file (CHAT_PAYLOAD_DICT_DIR) and are data, not
+code: rows written with one cannot be read without it, so deploy and back up
+that directory together with the chat databases. Each shard records the ids
+it uses and ConversationStore refuses to start if one is missing.
+"""
+import argparse
+import json
+import os
+import struct
+import zlib
+from collections import Counter
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for the zstd codec
+    zstandard = None
+
+FRAME_MAGIC = b"SV"
+FRAME_HEADER = struct.Struct(">2sBI")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PAYLOAD_CODEC = os.getenv("CHAT_PAYLOAD_CODEC", "zlib")
+DICT_DIR = os.getenv("CHAT_PAYLOAD_DICT_DIR", os.path.join(BASE_DIR, "payload_dicts"))
+ACTIVE_DICT_ID = int(os.getenv("CHAT_PAYLOAD_DICT_ID", "0"), 16)
+# zlib can only look back 32 KiB, so a larger dictionary would be wasted
+DICT_SIZE = 32 * 1024
+
+_dictionaries = {}
+
+
+def _dumps(conversation: list) -> bytes:
+    return json.dumps(conversation, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dictionary_path(dict_id: int, dict_dir: str = DICT_DIR) -> str:
+    return os.path.join(dict_dir, f"{dict_id:08x}.dict")
+
+
+def load_dictionary(dict_id: int, dict_dir: str = DICT_DIR) -> bytes:
+    """Return the dictionary bytes for an id, reading it from disk once."""
+    if dict_id not in _dictionaries:
+        path = dictionary_path(dict_id, dict_dir)
+        if not os.path.exists(path):
+            raise ValueError(f"Payload dictionary {dict_id:08x} not found at {path}")
+        with open(path, "rb") as f:
+            _dictionaries[dict_id] = f.read()
+    return _dictionaries[dict_id]
+
+
+def save_dictionary(data: bytes, dict_dir: str = DICT_DIR) -> int:
+    """Store a trained dictionary under its content id and return the id."""
+    # Never 0, which marks frames written without a dictionary
+    dict_id = zlib.crc32(data) or 1
+    os.makedirs(dict_dir, exist_ok=True)
+    with open(dictionary_path(dict_id, dict_dir), "wb") as f:
+        f.write(data)
+    _dictionaries[dict_id] = data
+    return dict_id
+
+
+def train_dictionary(samples: list, size: int = DICT_SIZE, codec_name: str = PAYLOAD_CODEC) -> bytes:
+    """Build a shared dictionary for a codec from sample conversations (lists of turns)."""
+    encoded = [_dumps(sample) for sample in samples]
+    if codec_name == "zstd":
+        if zstandard is None:
+            raise ImportError("Training a zstd dictionary requires the 'zstandard' package")
+        return zstandard.train_dictionary(size, encoded).as_bytes()
+
+    # zlib has no trainer: keep the phrases repeated across samples, most
+    # valuable last since zlib favours matches closest to the data
+    counts = Counter()
+    for data in encoded:
+        pieces = set(data.replace(b"\\n", b"\n").split(b"\n"))
+        counts.update(piece for piece in pieces if len(piece) >= 8)
+    phrases = [piece for piece, count in counts.items() if count > 1]
+    phrases.sort(key=lambda piece: counts[piece] * len(piece))
+
+    dictionary = b""
+    for piece in reversed(phrases):
+        if len(dictionary) + len(piece) > size:
+            continue
+        dictionary = piece + dictionary
+    return dictionary
+
+
+class JsonCodec:
+    """Legacy text format; kept so the old behaviour can be selected again."""
+
+    name = "json"
+    codec_id = 0
+
+    def encode(self, conversation: list) -> str:
+        return json.dumps(conversation, ensure_ascii=False)
+
+    @staticmethod
+    def decode_body(body: bytes, dictionary: bytes = None) -> list:
+        return json.loads(body)
+
+
+class ZlibCodec:
+    name = "zlib"
+    codec_id = 1
+
+    def __init__(self, dict_id: int = 0, level: int = 6):
+        self.dict_id = dict_id
+        self.level = level
+        self.dictionary = load_dictionary(dict_id) if dict_id else None
+
+    def encode(self, conversation: list) -> bytes:
+        if self.dictionary:
+            compressor = zlib.compressobj(self.level, zdict=self.dictionary)
+        else:
+            compressor = zlib.compressobj(self.level)
+        body = compressor.compress(_dumps(conversation)) + compressor.flush()
+        return FRAME_HEADER.pack(FRAME_MAGIC, self.codec_id, self.dict_id) + body
+
+    @staticmethod
+    def decode_body(body: bytes, dictionary: bytes = None) -> list:
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return json.loads(decompressor.decompress(body) + decompressor.flush())
+
+
+class ZstdCodec:
+    name = "zstd"
+    codec_id = 2
+
+    def __init__(self, dict_id: int = 0, level: int = 3):
+        if zstandard is None:
+            raise ImportError("The zstd payload codec requires the 'zstandard' package")
+        self.dict_id = dict_id
+        self.dictionary = load_dictionary(dict_id) if dict_id else None
+        zstd_dict = zstandard.ZstdCompressionDict(self.dictionary) if self.dictionary else None
+        self.compressor = zstandard.ZstdCompressor(level=level, dict_data=zstd_dict)
+
+    def encode(self, conversation: list) -> bytes:
+        body = self.compressor.compress(_dumps(conversation))
+        return FRAME_HEADER.pack(FRAME_MAGIC, self.codec_id, self.dict_id) + body
+
+    @staticmethod
+    def decode_body(body: bytes, dictionary: bytes = None) -> list:
+        if zstandard is None:
+            raise ImportError("Reading zstd payloads requires the 'zstandard' package")
+        zstd_dict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return json.loads(zstandard.ZstdDecompressor(dict_data=zstd_dict).decompress(body))
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, ZlibCodec, ZstdCodec)}
+_CODECS_BY_ID = {codec.codec_id: codec for codec in (JsonCodec, ZlibCodec, ZstdCodec)}
+
+
+def get_codec(name: str = PAYLOAD_CODEC, dict_id: int = ACTIVE_DICT_ID):
+    """Instantiate the codec used to write new payloads."""
+    if name not in CODECS:
+        raise ValueError(f"Unknown payload codec '{name}'. Choose from: {', '.join(CODECS)}")
+    if name == "json":
+        return JsonCodec()
+    return CODECS[name](dict_id)
+
+
+def decode_payload(payload) -> list:
+    """Decode a stored payload in any supported format, including legacy JSON text."""
+    if isinstance(payload, str):
+        return json.loads(payload)
+    payload = bytes(payload)
+    if not payload.startswith(FRAME_MAGIC):
+        return json.loads(payload)
+
+    _, codec_id, dict_id = FRAME_HEADER.unpack_from(payload)
+    if codec_id not in _CODECS_BY_ID:
+        raise ValueError(f"Unknown payload codec id {codec_id}")
+    dictionary = load_dictionary(dict_id) if dict_id else None
+    return _CODECS_BY_ID[codec_id].decode_body(payload[FRAME_HEADER.size:], dictionary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage conversation payload dictionaries.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train = subparsers.add_parser("train", help="train a dictionary from the conversation store")
+    train.add_argument("--limit", type=int, default=2000, help="max conversations to sample per shard")
+    train.add_argument("--size", type=int, default=DICT_SIZE)
+    train.add_argument("--codec", choices=["zlib", "zstd"], default=PAYLOAD_CODEC if PAYLOAD_CODEC != "json" else "zlib")
+    args = parser.parse_args()
+
+    from db import get_store
+
+    samples = []
+    for pool in get_store().pools:
+        with pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT messages FROM conversations ORDER BY timestamp DESC LIMIT ?", (args.limit,)
+            ).fetchall()
+        samples.extend(decode_payload(row[0]) for row in rows)
+
+    if not samples:
+        parser.error("no conversations found to train on")
+    dict_id = save_dictionary(train_dictionary(samples, args.size, args.codec))
+    print(f"✅ Trained dictionary from {len(samples)} conversation(s): {dictionary_path(dict_id)}")
+    print(f"👉 Set CHAT_PAYLOAD_CODEC={args.codec} CHAT_PAYLOAD_DICT_ID={dict_id:08x} to use it for new writes")
@@ -0,0 +1,71 @@
+# conversation_export.py
+"""
+Stream the conversation store out as JSONL, one line per turn:
+
+    {"user_id": "...", "turn": 0, "user": "...", "ai": "...", "ts": "..."}
+
+Rows are read in small id-ordered pages per shard, so memory use stays flat
+and no long read transaction holds up live writers.
+    python conversation_export.py --output conversations.jsonl.gz
+"""
+import argparse
+import gzip
+import json
+import sys
+
+from codec import decode_payload
+from db import get_store
+
+EXPORT_PAGE_SIZE = 50
+
+
+def iter_turns(store=None, since: str = None, page_size: int = EXPORT_PAGE_SIZE):
+    """Yield every stored turn as a dict, shard by shard."""
+    store = store or get_store()
+    for pool in store.pools:
+        last_id = 0
+        while True:
+            with pool.connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, user_id, messages, timestamp FROM conversations WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, page_size)
+                ).fetchall()
+            if not rows:
+                break
+            for row_id, user_id, payload, row_timestamp in rows:
+                last_id = row_id
+                for index, turn in enumerate(decode_payload(payload)):
+                    ts = turn.get("ts") or row_timestamp
+                    if since and ts < since:
+                        continue
+                    yield {"user_id": user_id, "turn": index, "user": turn["user"], "ai": turn["ai"], "ts": ts}
+
+
+def export_jsonl(output, store=None, since: str = None) -> int:
+    """Write every turn to a text file object; returns the number of turns written."""
+    count = 0
+    for record in iter_turns(store, since):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def open_jsonl(path: str, mode: str):
+    """Open a JSONL file, transparently gzipped when the name ends in .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export conversations as JSONL (one turn per line).")
+    parser.add_argument("--output", default="-", help="file path (.gz to compress) or - for stdout")
+    parser.add_argument("--since", help="only turns at or after this UTC time, e.g. '2025-06-01 00:00:00'")
+    args = parser.parse_args()
+
+    if args.output == "-":
+        written = export_jsonl(sys.stdout, since=args.since)
+    else:
+        with open_jsonl(args.output, "w") as f:
+            written = export_jsonl(f, since=args.since)
+    print(f"✅ Exported {written} turn(s)", file=sys.stderr)
@@ -1,66 +1,190 @@
+import os
+import queue
 import sqlite3
-from datetime import datetime
-import json
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
-conn = sqlite3.connect("chat_memory.db", check_same_thread=False)
-cursor = conn.cursor()
+from codec import decode_payload, get_codec, load_dictionary
 
-# Create table: store one row per turn (human + ai)
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS conversations (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id TEXT NOT NULL,
-    messages TEXT NOT NULL,  -- JSON: {"user": "...", "ai": "..."}
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-""")
-conn.commit()
+# Base path of the conversation store. With one shard this is the file itself,
+# with N shards the files are chat_memory_0.db ... chat_memory_{N-1}.db
+DB_PATH = os.getenv("CHAT_DB_PATH", "chat_memory.db")
+SHARD_COUNT = int(os.getenv("CHAT_DB_SHARDS", "1"))
+POOL_SIZE = int(os.getenv("CHAT_DB_POOL_SIZE", "4"))
 
 
-def save_turn(user_id: str, user_message: str, ai_message: str):
-    """Save a turn in a single row for the user, appending to existing conversation."""
-    # Load existing conversation for this user
-    cursor.execute("SELECT messages FROM conversations WHERE user_id = ?", (user_id,))
-    row = cursor.fetchone()
-
-    if row:
-        # Existing conversation: parse and append new turn
-        conversation = json.loads(row[0])
-    else:
-        # New conversation
-        conversation = []
-
-    # Append current turn
-    conversation.append({"user": user_message, "ai": ai_message})
-
-    # Convert to JSON string
-    messages_json = json.dumps(conversation, ensure_ascii=False)
-
-    if row:
-        # Update existing row
-        cursor.execute(
-            "UPDATE conversations SET messages = ?, timestamp = CURRENT_TIMESTAMP WHERE user_id = ?",
-            (messages_json, user_id)
-        )
-    else:
-        # Insert new row
-        cursor.execute(
-            "INSERT INTO conversations (user_id, messages) VALUES (?, ?)",
-            (user_id, messages_json)
-        )
+def shard_path(index: int, shard_count: int = SHARD_COUNT, base_path: str = DB_PATH) -> str:
+    """Return the file path of shard `index` for the given shard count."""
+    if shard_count == 1:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}_{index}{ext}"
+
+
+def shard_for_user(user_id: str, shard_count: int = SHARD_COUNT) -> int:
+    """Pick a shard for a user with a hash that is stable across processes."""
+    return zlib.crc32(user_id.encode("utf-8")) % shard_count
+
 
+def utc_timestamp() -> str:
+    """Current UTC time in the same format SQLite uses for CURRENT_TIMESTAMP."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def init_schema(conn: sqlite3.Connection):
+    """Create the conversations table in a shard if it does not exist."""
+    # Create table: store one row per user holding every turn (human + ai)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        messages TEXT NOT NULL,  -- [{"user": "...", "ai": "...", "ts": "..."}] as JSON text or a codec.py frame
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations (user_id)")
+    # Payload dictionaries (codec.py) that rows in this shard were written with
+    conn.execute("CREATE TABLE IF NOT EXISTS payload_dictionaries (dict_id INTEGER PRIMARY KEY)")
     conn.commit()
 
 
+def check_dictionaries(conn: sqlite3.Connection, codec):
+    """Record the codec's dictionary and make sure every one the shard uses can be loaded."""
+    dict_id = getattr(codec, "dict_id", 0)
+    if dict_id:
+        conn.execute("INSERT OR IGNORE INTO payload_dictionaries (dict_id) VALUES (?)", (dict_id,))
+        conn.commit()
+    for (used_id,) in conn.execute("SELECT dict_id FROM payload_dictionaries"):
+        # Raises ValueError now instead of failing every later read of those rows
+        load_dictionary(used_id)
 
-def load_history(user_id: str, limit: int = 10):
-    """Load the last N turns for a user from a single-row conversation."""
-    cursor.execute("SELECT messages FROM conversations WHERE user_id = ?", (user_id,))
-    row = cursor.fetchone()
-    if row:
-        conversation = json.loads(row[0])
-        # Keep only the last N turns
-        return conversation[-limit:]
-    return []
 
+class ConnectionPool:
+    """Fixed-size pool of connections to a single shard file."""
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self._connections = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._connections.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        # Only takes effect on a brand-new file, and must precede the WAL switch;
+        # lets the maintenance job hand freed pages back to the OS in small steps
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL lets readers of a shard proceed while its writer commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, rolling back anything left uncommitted."""
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._connections.put(conn)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+class ConversationStore:
+    """Conversation history split across N SQLite files by user_id."""
+
+    def __init__(self, base_path: str = DB_PATH, shard_count: int = SHARD_COUNT, pool_size: int = POOL_SIZE,
+                 codec=None):
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1")
+        self.base_path = base_path
+        self.shard_count = shard_count
+        # Codec used for writes; reads decode whatever format a row was stored in
+        self.codec = codec or get_codec()
+        self.pools = [
+            ConnectionPool(shard_path(i, shard_count, base_path), pool_size)
+            for i in range(shard_count)
+        ]
+        for pool in self.pools:
+            with pool.connection() as conn:
+                init_schema(conn)
+                check_dictionaries(conn, self.codec)
+
+    def pool_for(self, user_id: str) -> ConnectionPool:
+        return self.pools[shard_for_user(user_id, self.shard_count)]
 
+    def save_turn(self, user_id: str, user_message: str, ai_message: str):
+        """Save a turn in a single row for the user, appending to existing conversation."""
+        with self.pool_for(user_id).connection() as conn:
+            # Take the shard's write lock up front so concurrent turns for the
+            # same user cannot overwrite each other's read-modify-write
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT messages FROM conversations WHERE user_id = ?", (user_id,)
+            ).fetchone()
+
+            # Existing conversation: parse and append new turn
+            conversation = decode_payload(row[0]) if row else []
+            conversation.append({"user": user_message, "ai": ai_message, "ts": utc_timestamp()})
+            payload = self.codec.encode(conversation)
+
+            if row:
+                conn.execute(
+                    "UPDATE conversations SET messages = ?, timestamp = CURRENT_TIMESTAMP WHERE user_id = ?",
+                    (payload, user_id)
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO conversations (user_id, messages) VALUES (?, ?)",
+                    (user_id, payload)
+                )
+            conn.commit()
+
+    def load_history(self, user_id: str, limit: int = 10):
+        """Load the last N turns for a user from a single-row conversation."""
+        with self.pool_for(user_id).connection() as conn:
+            row = conn.execute(
+                "SELECT messages FROM conversations WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row:
+            conversation = decode_payload(row[0])
+            # Keep only the last N turns
+            return conversation[-limit:]
+        return []
+
+    def close(self):
+        for pool in self.pools:
+            pool.close()
+
+
+# Default store used by the chatbot, opened on first use so offline tools can
+# import this module without touching the live files. Replaceable, e.g. by
+# tools pointing at a scratch copy.
+store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ConversationStore:
+    """Return the default store, opening it from the environment settings if needed."""
+    global store
+    if store is None:
+        with _store_lock:
+            if store is None:
+                store = ConversationStore()
+    return store
+
+
+def save_turn(user_id: str, user_message: str, ai_message: str):
+    """Save a turn for the user in their shard of the default store."""
+    get_store().save_turn(user_id, user_message, ai_message)
+
+
+def load_history(user_id: str, limit: int = 10):
+    """Load the last N turns for a user from the default store."""
+    return get_store().load_history(user_id, limit)
@@ -0,0 +1,157 @@
+# enrichment.py
+"""
+Background company research for prospects.
+
+Adding a prospect queues a lookup instead of the agent searching in the
+middle of a chat. A worker thread drains the queue in batches, dedupes by
+company domain, skips domains researched recently, spaces out calls to the
+search backend and stores results in the prospect_enrichment table, where
+get_prospect picks them up.
+
+Every app process (e.g. each gunicorn worker) runs its own queue against the
+shared sales_ai.db. A domain is only searched by the process that claims its
+'pending' row, so each lookup happens once; ENRICHMENT_MIN_INTERVAL applies
+per process.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from prospect_tool import (
+    claim_enrichment, get_connection, get_enrichment, mark_enrichment_pending, prospect_domain, save_enrichment
+)
+
+logger = logging.getLogger(__name__)
+
+ENRICHMENT_BATCH_SIZE = int(os.getenv("ENRICHMENT_BATCH_SIZE", "10"))
+# Minimum seconds between two calls to the search backend
+ENRICHMENT_MIN_INTERVAL = float(os.getenv("ENRICHMENT_MIN_INTERVAL", "1.0"))
+# Research older than this is fetched again
+ENRICHMENT_REFRESH_DAYS = int(os.getenv("ENRICHMENT_REFRESH_DAYS", "30"))
+# A domain claimed longer ago than this is assumed abandoned (its process died)
+ENRICHMENT_CLAIM_TIMEOUT = int(os.getenv("ENRICHMENT_CLAIM_TIMEOUT", "600"))
+# Keep stored research short enough to hand straight to the agent
+MAX_RESEARCH_CHARS = 2000
+
+
+class EnrichmentQueue:
+    """Queue of company lookups processed by a single background worker per process."""
+
+    def __init__(self, search, batch_size: int = ENRICHMENT_BATCH_SIZE,
+                 min_interval: float = ENRICHMENT_MIN_INTERVAL, refresh_days: int = ENRICHMENT_REFRESH_DAYS):
+        self.search = search
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.refresh_days = refresh_days
+        self._queue = queue.Queue()
+        self._last_search = 0.0
+        self._thread = None
+        self._started = False
+        self._start_lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def enqueue(self, email: str, company: str) -> bool:
+        """Queue research for a prospect's company; returns immediately."""
+        domain = prospect_domain(email, company)
+        # Nothing to research without an email domain or a company name
+        if domain == "company:" or self._is_fresh(domain):
+            return False
+        mark_enrichment_pending(domain, company)
+        self._queue.put((domain, company))
+        if self._started:
+            # Restarts the worker in a forked child (gunicorn --preload)
+            self.start()
+        return True
+
+    def enqueue_missing(self) -> int:
+        """Queue every prospect without research, e.g. after a bulk import into prospect_data."""
+        conn = get_connection()
+        rows = conn.execute("SELECT email, company FROM prospect_data").fetchall()
+        conn.close()
+        queued = 0
+        for email, company in rows:
+            # Rows written outside add_prospect may be incomplete; one must not stop the rest
+            try:
+                queued += self.enqueue(email, company)
+            except Exception as e:
+                logger.error(f"Could not queue enrichment for {email}: {str(e)}")
+        return queued
+
+    def start(self, backfill: bool = False) -> threading.Thread:
+        """Start the worker; with backfill it first queues every prospect missing research."""
+        with self._start_lock:
+            self._started = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(backfill,), name="prospect-enrichment", daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def _after_fork(self):
+        # Threads don't survive fork(), and the lock or queue may have been held
+        # mid-operation; the parent's worker keeps handling what it had queued
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._queue = queue.Queue()
+
+    def _is_fresh(self, domain: str) -> bool:
+        enrichment = get_enrichment(domain)
+        if not enrichment or enrichment[0] != "done":
+            return False
+        refreshed_after = datetime.now() - timedelta(days=self.refresh_days)
+        return datetime.fromisoformat(enrichment[2]) > refreshed_after
+
+    def _next_batch(self) -> dict:
+        """Block for one item, then take whatever else is waiting, deduped by domain."""
+        domain, company = self._queue.get()
+        batch = {domain: company}
+        while len(batch) < self.batch_size:
+            try:
+                domain, company = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.setdefault(domain, company)
+        return batch
+
+    def _wait_for_rate_limit(self):
+        delay = self._last_search + self.min_interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._last_search = time.monotonic()
+
+    def _research(self, domain: str, company: str):
+        now = datetime.now()
+        stale_before = (now - timedelta(seconds=ENRICHMENT_CLAIM_TIMEOUT)).isoformat()
+        refresh_before = (now - timedelta(days=self.refresh_days)).isoformat()
+        # Fresh, or another process is already searching it
+        if not claim_enrichment(domain, stale_before, refresh_before):
+            return
+        company = company or ""
+        query = f"{company} company overview" if domain.startswith("company:") else f"{company} {domain} company overview"
+        self._wait_for_rate_limit()
+        try:
+            research = str(self.search(query.strip()))[:MAX_RESEARCH_CHARS]
+        except Exception as e:
+            logger.error(f"Enrichment lookup failed for {domain}: {str(e)}")
+            save_enrichment(domain, company, "failed")
+            return
+        save_enrichment(domain, company, "done", research)
+
+    def _run(self, backfill: bool = False):
+        # Backfill here rather than in the caller, so startup never waits on (or dies with) it
+        if backfill:
+            try:
+                logger.info(f"Enrichment backfill queued {self.enqueue_missing()} prospect(s)")
+            except Exception as e:
+                logger.error(f"Enrichment backfill failed: {str(e)}")
+        while True:
+            batch = self._next_batch()
+            for domain, company in batch.items():
+                # This is the only worker; one bad item (e.g. "database is locked") must not stop it
+                try:
+                    self._research(domain, company)
+                except Exception as e:
+                    logger.error(f"Enrichment failed for {domain}: {str(e)}")
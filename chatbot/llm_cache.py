@@ -0,0 +1,220 @@
+# llm_cache.py
+"""
+Response cache for LLM-backed tools.
+
+Tools opt in one by one (LLM_CACHE_TOOLS). Prompts are normalized before
+keying, entries expire after a TTL, the in-memory tier is LRU-bounded and every
+entry is also persisted to SQLite so restarts keep a warm cache. A tool may
+additionally accept near-duplicate prompts above a similarity threshold, but
+only when they name exactly the same people and addresses, so a draft written
+for one prospect is never handed out for another.
+Tools with side effects (sending mail) can never be enabled.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "llm_cache.db")
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+# Row cap of the SQLite tier; oldest entries beyond it are pruned every PRUNE_EVERY inserts
+CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "10000"))
+# Prune the SQLite tier after this many inserts
+PRUNE_EVERY = 100
+# Comma-separated tool names that opt in to caching, e.g. "generate_cold_email_draft"; none by default
+CACHE_TOOLS = [name.strip() for name in os.getenv("LLM_CACHE_TOOLS", "").split(",") if name.strip()]
+# Word-overlap threshold (0-1) for reusing a near-duplicate prompt; 0 = exact matches only
+CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0"))
+
+# Tools whose calls have side effects; their results must never be reused
+NEVER_CACHE = {"send_cold_email", "create_email"}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase and collapse whitespace so trivially different prompts share a key."""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+def _prompt_key(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _words(normalized: str) -> frozenset:
+    return frozenset(re.findall(r"\w+", normalized))
+
+
+def recipient_identity(prompt: str) -> str:
+    """Email addresses and capitalized words (names, companies) in the raw prompt."""
+    emails = {email.lower() for email in re.findall(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+", prompt)}
+    names = set(re.findall(r"\b[A-Z][\w'-]*", re.sub(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+", " ", prompt)))
+    return " ".join(sorted(emails | names))
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two word sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    """Two-tier (LRU memory + SQLite) cache of LLM responses per tool."""
+
+    def __init__(self, db_path: str = CACHE_DB_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_rows: int = CACHE_MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._policies = {}
+        # (tool, key) -> (words, identity, response, expires_at); order = recency
+        self._entries = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(llm_cache)")]
+        if columns and "identity" not in columns:
+            # Entries from before recipient matching can't be checked; it's only a cache
+            self._conn.execute("DROP TABLE llm_cache")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            tool TEXT NOT NULL,
+            prompt_key TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            identity TEXT NOT NULL,
+            response TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (tool, prompt_key)
+        )
+        """)
+        self._prune()
+
+    def _prune(self):
+        """Drop expired rows and the oldest rows beyond CACHE_MAX_ROWS from the SQLite tier."""
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE rowid IN (SELECT rowid FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
+        self._conn.commit()
+
+    def enable(self, tool: str, ttl: int = CACHE_TTL, min_similarity: float = 0.0):
+        """Opt a tool in to caching and warm its memory tier from SQLite."""
+        if tool in NEVER_CACHE:
+            raise ValueError(f"Tool '{tool}' has side effects and cannot be cached")
+        with self._lock:
+            self._policies[tool] = {"ttl": ttl, "min_similarity": min_similarity}
+            self._stats.setdefault(tool, Counter())
+            rows = self._conn.execute(
+                "SELECT prompt_key, prompt, identity, response, expires_at FROM llm_cache "
+                "WHERE tool = ? AND expires_at >= ? ORDER BY expires_at DESC LIMIT ?",
+                (tool, time.time(), self.max_entries)
+            ).fetchall()
+            for key, prompt, identity, response, expires_at in reversed(rows):
+                self._remember(tool, key, _words(prompt), identity, response, expires_at)
+
+    def is_enabled(self, tool: str) -> bool:
+        return tool in self._policies
+
+    def _remember(self, tool, key, words, identity, response, expires_at):
+        self._entries[(tool, key)] = (words, identity, response, expires_at)
+        self._entries.move_to_end((tool, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, tool: str, key: str, words: frozenset, identity: str, min_similarity: float):
+        """Return (response, kind) from the cheapest tier that has it, or (None, None)."""
+        now = time.time()
+        entry = self._entries.get((tool, key))
+        if entry and entry[3] >= now:
+            self._entries.move_to_end((tool, key))
+            return entry[2], "hit"
+
+        row = self._conn.execute(
+            "SELECT response, expires_at FROM llm_cache WHERE tool = ? AND prompt_key = ? AND expires_at >= ?",
+            (tool, key, now)
+        ).fetchone()
+        if row:
+            self._remember(tool, key, words, identity, row[0], row[1])
+            return row[0], "hit"
+
+        if min_similarity:
+            best_score, best_key = 0.0, None
+            for (entry_tool, entry_key), (entry_words, entry_identity, _, expires_at) in self._entries.items():
+                # A near hit must be about the same recipients, only worded differently
+                if entry_tool != tool or expires_at < now or entry_identity != identity:
+                    continue
+                score = similarity(words, entry_words)
+                if score > best_score:
+                    best_score, best_key = score, entry_key
+            if best_key and best_score >= min_similarity:
+                self._entries.move_to_end((tool, best_key))
+                return self._entries[(tool, best_key)][2], "near_hit"
+
+        return None, None
+
+    def get_or_call(self, tool: str, prompt: str, call, refresh: bool = False) -> str:
+        """Return a cached response for the prompt, or call the LLM and cache its result.
+
+        With refresh the LLM is always called and its result replaces the cached one.
+        """
+        policy = self._policies.get(tool)
+        if policy is None:
+            return call()
+
+        normalized = normalize_prompt(prompt)
+        key = _prompt_key(normalized)
+        words = _words(normalized)
+        identity = recipient_identity(prompt)
+        with self._lock:
+            stats = self._stats[tool]
+            stats["requests"] += 1
+            response, kind = (None, None) if refresh else self._lookup(tool, key, words, identity, policy["min_similarity"])
+            if response is not None:
+                stats[kind + "s"] += 1
+                logger.debug(f"LLM cache {kind} for {tool}")
+                return response
+            stats["misses"] += 1
+
+        # Call outside the lock so slow LLM requests don't serialize each other
+        response = call()
+        expires_at = time.time() + policy["ttl"]
+        with self._lock:
+            self._remember(tool, key, words, identity, response, expires_at)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (tool, prompt_key, prompt, identity, response, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tool, key, normalized, identity, response, expires_at)
+            )
+            self._conn.commit()
+            self._inserts += 1
+            if self._inserts % PRUNE_EVERY == 0:
+                self._prune()
+        return response
+
+    def stats(self) -> dict:
+        """Per-tool hit rates and LLM calls saved."""
+        with self._lock:
+            report = {}
+            for tool, counts in self._stats.items():
+                saved = counts["hits"] + counts["near_hits"]
+                report[tool] = {
+                    "requests": counts["requests"],
+                    "hits": counts["hits"],
+                    "near_hits": counts["near_hits"],
+                    "misses": counts["misses"],
+                    "hit_rate": round(saved / counts["requests"], 3) if counts["requests"] else 0.0,
+                    "llm_calls_saved": saved,
+                }
+            return {"tools": report, "memory_entries": len(self._entries)}
+
+
+response_cache = ResponseCache()
+for _tool in CACHE_TOOLS:
+    response_cache.enable(_tool, min_similarity=CACHE_SIMILARITY)
@@ -0,0 +1,221 @@
+# maintenance.py
+"""
+Retention, archival and compaction for the conversation store.
+
+Turns beyond the per-user cap or older than the age limit are moved into
+gzip-compressed JSONL archive files, then freed pages are handed back with
+incremental vacuum. Every user is handled in its own short write
+transaction, so the job can run next to live /chat traffic.
+
+Run once from the command line:
+    python maintenance.py
+or in the app by setting CHAT_MAINTENANCE_INTERVAL (seconds).
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from codec import decode_payload
+from db import get_store
+
+logger = logging.getLogger(__name__)
+
+# Keep at most this many turns per user (0 = no cap)
+RETENTION_MAX_TURNS = int(os.getenv("CHAT_RETENTION_MAX_TURNS", "200"))
+# Archive turns older than this many days (0 = no age limit)
+RETENTION_MAX_AGE_DAYS = int(os.getenv("CHAT_RETENTION_MAX_AGE_DAYS", "180"))
+ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "archive")
+MAINTENANCE_INTERVAL = int(os.getenv("CHAT_MAINTENANCE_INTERVAL", "0"))
+# Pages released per incremental_vacuum step; small steps keep the write lock short
+VACUUM_STEP_PAGES = 1000
+
+
+class ArchiveWriter:
+    """Append-only gzip JSONL file, opened on the first archived turn."""
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self.path = None
+        self._file = None
+        self.turns_written = 0
+
+    def write(self, user_id: str, turns: list):
+        if self._file is None:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+            self.path = os.path.join(self.archive_dir, f"conversations-{stamp}.jsonl.gz")
+            self._file = gzip.open(self.path, "at", encoding="utf-8")
+        record = {"user_id": user_id, "archived_at": datetime.now(timezone.utc).isoformat(), "turns": turns}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Flush before the caller commits the delete, so a crash never loses turns
+        self._file.flush()
+        self.turns_written += len(turns)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def split_expired(conversation: list, row_timestamp: str, max_turns: int, cutoff: str = None):
+    """Split turns into (kept, expired) by age cutoff and per-user turn cap."""
+    kept, expired = [], []
+    for turn in conversation:
+        # Turns saved before per-turn timestamps fall back to the row's last update
+        turn_time = turn.get("ts") or row_timestamp
+        if cutoff and turn_time < cutoff:
+            expired.append(turn)
+        else:
+            kept.append(turn)
+
+    if max_turns and len(kept) > max_turns:
+        expired.extend(kept[:-max_turns])
+        kept = kept[-max_turns:]
+    return kept, expired
+
+
+def _database_pages(conn):
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count, freelist, page_size
+
+
+def compact_shard(pool, codec, archive: ArchiveWriter, max_turns: int, cutoff: str = None) -> dict:
+    """Archive expired turns for every user in one shard."""
+    with pool.connection() as conn:
+        user_ids = [row[0] for row in conn.execute("SELECT user_id FROM conversations")]
+
+    users_trimmed = users_removed = turns_archived = 0
+    for user_id in user_ids:
+        with pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Re-read inside the write lock; a turn may have been saved since the listing
+            row = conn.execute(
+                "SELECT messages, timestamp FROM conversations WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if not row:
+                conn.rollback()
+                continue
+
+            kept, expired = split_expired(decode_payload(row[0]), row[1], max_turns, cutoff)
+            if not expired:
+                conn.rollback()
+                continue
+
+            archive.write(user_id, expired)
+            if kept:
+                conn.execute(
+                    "UPDATE conversations SET messages = ? WHERE user_id = ?",
+                    (codec.encode(kept), user_id)
+                )
+                users_trimmed += 1
+            else:
+                conn.execute("DELETE FROM conversations WHERE user_id = ?", (user_id,))
+                users_removed += 1
+            conn.commit()
+            turns_archived += len(expired)
+
+    return {"users_trimmed": users_trimmed, "users_removed": users_removed, "turns_archived": turns_archived}
+
+
+def vacuum_shard(pool, convert: bool = False) -> dict:
+    """Release free pages of one shard in small incremental steps."""
+    with pool.connection() as conn:
+        pages_before, freelist_before, page_size = _database_pages(conn)
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if not convert:
+                logger.warning(
+                    f"{pool.path} predates incremental vacuum; run maintenance with --convert-vacuum "
+                    f"during a quiet period to enable it ({freelist_before} free pages not reclaimed)"
+                )
+                return {"pages_before": pages_before, "pages_after": pages_before, "bytes_reclaimed": 0}
+            # One-off full VACUUM to switch the file over; blocks writers while it runs
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+                # incremental_vacuum only frees pages as its result rows are stepped
+                conn.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})").fetchall()
+
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        pages_after, freelist_after, _ = _database_pages(conn)
+
+    # Count released free pages rather than the change in file size, which
+    # live save_turn traffic can grow while this runs
+    return {
+        "pages_before": pages_before,
+        "pages_after": pages_after,
+        "bytes_reclaimed": max(freelist_before - freelist_after, 0) * page_size,
+    }
+
+
+def run_maintenance(max_turns: int = RETENTION_MAX_TURNS, max_age_days: int = RETENTION_MAX_AGE_DAYS,
+                    archive_dir: str = ARCHIVE_DIR, convert_vacuum: bool = False, store=None) -> dict:
+    """Run retention, archival and vacuum over every shard and return a report."""
+    store = store or get_store()
+    cutoff = None
+    if max_age_days:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    started = time.perf_counter()
+    archive = ArchiveWriter(archive_dir)
+    report = {"shards": [], "turns_archived": 0, "bytes_reclaimed": 0}
+    try:
+        for pool in store.pools:
+            shard = {"path": pool.path}
+            shard.update(compact_shard(pool, store.codec, archive, max_turns, cutoff))
+            shard.update(vacuum_shard(pool, convert_vacuum))
+            report["shards"].append(shard)
+            report["turns_archived"] += shard["turns_archived"]
+            report["bytes_reclaimed"] += shard["bytes_reclaimed"]
+    finally:
+        archive.close()
+
+    report["archive_file"] = archive.path
+    report["duration_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Maintenance archived {report['turns_archived']} turn(s), "
+        f"reclaimed {report['bytes_reclaimed']} bytes in {report['duration_seconds']}s"
+    )
+    return report
+
+
+def start_background_maintenance(interval: int = MAINTENANCE_INTERVAL) -> threading.Thread:
+    """Run maintenance every `interval` seconds on a daemon thread."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                run_maintenance()
+            except Exception as e:
+                logger.error(f"Conversation maintenance failed: {str(e)}")
+
+    thread = threading.Thread(target=loop, name="chat-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old turns and compact the conversation store.")
+    parser.add_argument("--max-turns", type=int, default=RETENTION_MAX_TURNS, help="turns kept per user (0 = no cap)")
+    parser.add_argument("--max-age-days", type=int, default=RETENTION_MAX_AGE_DAYS, help="0 = no age limit")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--convert-vacuum", action="store_true",
+                        help="run a one-off full VACUUM on files created before incremental vacuum")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = run_maintenance(args.max_turns, args.max_age_days, args.archive_dir, args.convert_vacuum)
+    for shard in result["shards"]:
+        print(f"🗄️  {shard['path']}: archived {shard['turns_archived']} turn(s), "
+              f"trimmed {shard['users_trimmed']} / removed {shard['users_removed']} user(s), "
+              f"reclaimed {shard['bytes_reclaimed']} bytes")
+    if result["archive_file"]:
+        print(f"📦 Archive: {result['archive_file']}")
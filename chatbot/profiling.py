@@ -0,0 +1,227 @@
+# profiling.py
+"""
+Opt-in allocation profiling for /chat requests.
+
+When enabled (CHAT_PROFILING=1 or POST /admin/profiling), tracemalloc
+snapshots are taken around each phase of a request: history load, agent run,
+every tool call, and save. The allocation sites that grew the most are
+accumulated per phase, and a background thread records periodic heap-growth
+reports. When disabled, phase() hands back a shared no-op context manager
+and tracemalloc is stopped, so the request path pays one flag check.
+
+tracemalloc is process-wide: with concurrent requests a phase's diff also
+includes allocations made by other threads at the same time.
+"""
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("CHAT_PROFILING", "0") == "1"
+# Seconds between heap-growth reports while profiling is on
+HEAP_REPORT_INTERVAL = int(os.getenv("CHAT_PROFILING_HEAP_INTERVAL", "60"))
+# Stack depth recorded per allocation; 1 keeps tracemalloc overhead lowest
+TRACE_FRAMES = int(os.getenv("CHAT_PROFILING_FRAMES", "1"))
+TOP_SITES = 10
+HEAP_REPORTS_KEPT = 30
+
+# Keep the profiler's own bookkeeping out of the results
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+]
+
+_enabled = False
+_lock = threading.Lock()
+# phase -> {"calls": n, "sites": {site: [size_diff, count_diff]}}
+_phase_stats = {}
+_heap_reports = deque(maxlen=HEAP_REPORTS_KEPT)
+# Bumped by every enable(); a heap thread from an earlier session stops itself
+_session = 0
+
+
+def _snapshot():
+    """Filtered snapshot, or None if profiling was switched off meanwhile."""
+    try:
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    except RuntimeError:
+        return None
+
+
+def _record(phase_name: str, before, after):
+    if before is None or after is None:
+        return
+    diff = after.compare_to(before, "lineno")
+    with _lock:
+        stats = _phase_stats.setdefault(phase_name, {"calls": 0, "sites": {}})
+        stats["calls"] += 1
+        for stat in diff[:TOP_SITES * 5]:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            site = stats["sites"].setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+            site[0] += stat.size_diff
+            site[1] += stat.count_diff
+
+
+class _NoopPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_PHASE = _NoopPhase()
+
+
+class _Phase:
+    def __init__(self, name: str):
+        self.name = name
+        self.before = None
+
+    def __enter__(self):
+        self.before = _snapshot()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.before, _snapshot())
+        return False
+
+
+def phase(name: str):
+    """Context manager that profiles allocations of one request phase when enabled."""
+    if not _enabled:
+        return _NOOP_PHASE
+    return _Phase(name)
+
+
+class ToolProfilingCallback(BaseCallbackHandler):
+    """Profiles each tool call the agent makes as its own 'tool:<name>' phase."""
+
+    def __init__(self):
+        self._running = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        if _enabled:
+            self._running[run_id] = ((serialized or {}).get("name", "unknown"), _snapshot())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        started = self._running.pop(run_id, None)
+        if started:
+            _record(f"tool:{started[0]}", started[1], _snapshot())
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.on_tool_end(None, run_id=run_id)
+
+
+def agent_config():
+    """Agent invoke config that profiles tool calls, or None when profiling is off."""
+    if not _enabled:
+        return None
+    return {"callbacks": [ToolProfilingCallback()]}
+
+
+def _rss_bytes() -> int:
+    """Current resident set size, or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _heap_loop(interval: int, session: int):
+    # Baseline from this tracemalloc session only; traces of an earlier session aren't comparable
+    previous = _snapshot()
+    while True:
+        time.sleep(interval)
+        if not _enabled or session != _session:
+            return
+        current = _snapshot()
+        if current is None or previous is None:
+            return
+        growth = current.compare_to(previous, "lineno")
+        traced, peak = tracemalloc.get_traced_memory()
+        report = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "rss_bytes": _rss_bytes(),
+            "traced_bytes": traced,
+            "traced_peak_bytes": peak,
+            "growth_bytes": sum(stat.size_diff for stat in growth),
+            "top_growth": [
+                {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in growth[:TOP_SITES] if stat.size_diff > 0
+            ],
+        }
+        with _lock:
+            _heap_reports.append(report)
+        logger.info(f"Heap report: rss={report['rss_bytes']} traced={traced} growth={report['growth_bytes']}")
+        previous = current
+
+
+def enable(interval: int = HEAP_REPORT_INTERVAL):
+    """Start tracemalloc and the periodic heap-growth reports."""
+    global _enabled, _session
+    with _lock:
+        if _enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        _enabled = True
+        _session += 1
+        session = _session
+    threading.Thread(target=_heap_loop, args=(interval, session), name="heap-reports", daemon=True).start()
+    logger.info("Allocation profiling enabled")
+
+
+def disable():
+    """Stop tracemalloc; collected results stay available until reset()."""
+    global _enabled
+    with _lock:
+        _enabled = False
+        tracemalloc.stop()
+    logger.info("Allocation profiling disabled")
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _phase_stats.clear()
+        _heap_reports.clear()
+
+
+def report(top: int = TOP_SITES) -> dict:
+    """Top allocation sites per phase plus recent heap-growth reports."""
+    with _lock:
+        phases = {}
+        for name, stats in _phase_stats.items():
+            sites = sorted(stats["sites"].items(), key=lambda item: item[1][0], reverse=True)[:top]
+            phases[name] = {
+                "calls": stats["calls"],
+                "top_sites": [
+                    {"site": site, "size_bytes": size, "count": count, "avg_bytes_per_call": size // stats["calls"]}
+                    for site, (size, count) in sites
+                ],
+            }
+        return {
+            "enabled": _enabled,
+            "rss_bytes": _rss_bytes(),
+            "phases": phases,
+            "heap_reports": list(_heap_reports),
+        }
+
+
+if PROFILING_ENABLED:
+    enable()
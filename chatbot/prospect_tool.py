@@ -1,8 +1,12 @@
 # prospect_tool.py
+import os
 import sqlite3
 from datetime import datetime
 
-DB_PATH = "sales_ai.db"
+DB_PATH = os.getenv("SALES_DB_PATH", "sales_ai.db")
+
+# Webmail domains say nothing about the company, so research is keyed by name instead
+FREEMAIL_DOMAINS = {"gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "icloud.com", "aol.com", "proton.me"}
 
 def get_connection():
     """Get a fresh database connection."""
@@ -23,9 +27,75 @@ def init_db():
         created_at TEXT
     )
     """)
+    # Background company research, one row per company domain (see enrichment.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS prospect_enrichment (
+        domain TEXT PRIMARY KEY,
+        company TEXT,
+        status TEXT,
+        research TEXT,
+        updated_at TEXT
+    )
+    """)
     conn.commit()
     conn.close()
 
+def prospect_domain(email: str, company: str = "") -> str:
+    """Key used to share research between prospects at the same company."""
+    # Both columns are nullable in prospect_data
+    email = email or ""
+    domain = email.rsplit("@", 1)[-1].strip().lower() if "@" in email else ""
+    if domain and domain not in FREEMAIL_DOMAINS:
+        return domain
+    return "company:" + " ".join((company or "").lower().split())
+
+def mark_enrichment_pending(domain: str, company: str):
+    """Record that research for a domain has been requested."""
+    conn = get_connection()
+    conn.execute(
+        "INSERT INTO prospect_enrichment (domain, company, status, updated_at) VALUES (?, ?, 'pending', ?) "
+        "ON CONFLICT(domain) DO UPDATE SET status = 'pending' WHERE status = 'failed'",
+        (domain, company, datetime.now().isoformat())
+    )
+    conn.commit()
+    conn.close()
+
+def claim_enrichment(domain: str, stale_before: str, refresh_before: str) -> bool:
+    """Mark a domain 'running' for the caller; False if another process holds it or its research is current.
+
+    A 'running' claim older than stale_before (its process died) and research
+    older than refresh_before can be claimed again.
+    """
+    conn = get_connection()
+    cursor = conn.execute(
+        "UPDATE prospect_enrichment SET status = 'running', updated_at = ? WHERE domain = ? AND ("
+        "status = 'pending' OR (status = 'running' AND updated_at < ?) OR (status = 'done' AND updated_at < ?))",
+        (datetime.now().isoformat(), domain, stale_before, refresh_before)
+    )
+    conn.commit()
+    claimed = cursor.rowcount == 1
+    conn.close()
+    return claimed
+
+def save_enrichment(domain: str, company: str, status: str, research: str = ""):
+    """Store the research result (or failure) for a domain."""
+    conn = get_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO prospect_enrichment (domain, company, status, research, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (domain, company, status, research, datetime.now().isoformat())
+    )
+    conn.commit()
+    conn.close()
+
+def get_enrichment(domain: str):
+    """Return (status, research, updated_at) for a domain, or None."""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT status, research, updated_at FROM prospect_enrichment WHERE domain = ?", (domain,)
+    ).fetchone()
+    conn.close()
+    return row
+
 def add_prospect(name: str, email: str, company: str, details: str = "") -> str:
     try:
         conn = get_connection()
@@ -86,7 +156,15 @@ def get_prospect(email: str) -> str:
         conn.close()
         
         if row:
-            return f"Name: {row[0]}, Email: {row[1]}, Company: {row[2]}, Details: {row[3]}"
+            result = f"Name: {row[0]}, Email: {row[1]}, Company: {row[2]}, Details: {row[3]}"
+            # Attach the research gathered in the background, if any
+            enrichment = get_enrichment(prospect_domain(row[1], row[2] or ""))
+            # A refresh in progress ('running') still has the previous research
+            if enrichment and enrichment[1]:
+                result += f"\nCompany research: {enrichment[1]}"
+            elif enrichment and enrichment[0] in ("pending", "running"):
+                result += "\nCompany research: still being gathered."
+            return result
         return "❌ Prospect not found."
     except Exception as e:
         return f"❌ Error getting prospect: {str(e)}"
@@ -0,0 +1,167 @@
+# replay.py
+"""
+Replay exported conversations through get_sales_ai_response and report latency.
+
+Reads the JSONL written by conversation_export.py and sends each recorded user
+message back through the full request path. Conversations, prospects and the
+LLM response cache all point at scratch copies, so production data is never
+touched. The LLM side can be:
+
+    recorded  the agent returns the AI reply recorded for that turn (default)
+    fake      the agent returns a fixed reply
+    live      the real agent and LLM (costs tokens; searches are real, but
+              sending mail is stubbed out)
+
+Recorded and fake modes can add --llm-latency to stand in for model time.
+Turns of one user run in order; users run in parallel up to --concurrency.
+With --speed N the recorded gaps between turns are replayed N times faster
+(0 = as fast as possible).
+    python replay.py conversations.jsonl.gz --concurrency 8 --speed 60
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from langchain.schema import AIMessage
+
+import db
+from conversation_export import open_jsonl
+
+_current = threading.local()
+
+
+class ReplayAgent:
+    """Stands in for the LangGraph agent, answering with the recorded reply."""
+
+    def __init__(self, latency: float = 0.0, fixed_reply: str = None):
+        self.latency = latency
+        self.fixed_reply = fixed_reply
+
+    def invoke(self, inputs: dict, config=None):
+        if self.latency:
+            time.sleep(self.latency)
+        reply = self.fixed_reply if self.fixed_reply is not None else _current.recorded_reply
+        return {"messages": inputs["messages"] + [AIMessage(content=reply)]}
+
+
+def load_turns(path: str, limit: int = 0) -> dict:
+    """Group exported turns by user, keeping each user's order."""
+    turns_by_user = {}
+    with open_jsonl(path, "r") as f:
+        for count, line in enumerate(f):
+            if limit and count >= limit:
+                break
+            record = json.loads(line)
+            turns_by_user.setdefault(record["user_id"], []).append(record)
+    return turns_by_user
+
+
+def _offset_seconds(ts: str, first: datetime) -> float:
+    return (datetime.strptime(ts, "%Y-%m-%d %H:%M:%S") - first).total_seconds()
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def use_scratch_state(workdir: str, shard_count: int):
+    """Point every store the chatbot writes to at files in workdir, and stub out mail."""
+    # prospect_tool and the response cache open their databases on import
+    # (chatbot imports both), so redirect them before importing chatbot
+    prospects_path = os.getenv("SALES_DB_PATH", "sales_ai.db")
+    scratch_prospects = os.path.join(workdir, "sales_ai.db")
+    if os.path.exists(prospects_path):
+        shutil.copyfile(prospects_path, scratch_prospects)
+    os.environ["SALES_DB_PATH"] = scratch_prospects
+    os.environ["LLM_CACHE_DB_PATH"] = os.path.join(workdir, "llm_cache.db")
+    import chatbot
+
+    db.store = db.ConversationStore(os.path.join(workdir, "chat_memory.db"), shard_count)
+
+    # Replayed "send it" turns must never reach a real inbox
+    chatbot.send_email_job = lambda context: "✅ Email send skipped during replay"
+    return chatbot
+
+
+def replay(respond, turns_by_user: dict, concurrency: int = 4, speed: float = 0.0) -> dict:
+    """Run every turn through respond (get_sales_ai_response) and collect latencies."""
+    timestamps = [turn["ts"] for turns in turns_by_user.values() for turn in turns if turn.get("ts")]
+    first = datetime.strptime(min(timestamps), "%Y-%m-%d %H:%M:%S") if timestamps else None
+    latencies, errors = [], []
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def run_user(user_id: str, turns: list):
+        for turn in turns:
+            if speed and first and turn.get("ts"):
+                delay = started + _offset_seconds(turn["ts"], first) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            _current.recorded_reply = turn["ai"]
+            request_started = time.perf_counter()
+            try:
+                respond(turn["user"], user_id)
+                with lock:
+                    latencies.append(time.perf_counter() - request_started)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{user_id}#{turn['turn']}: {str(e)}")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for user_id, turns in turns_by_user.items():
+            executor.submit(run_user, user_id, turns)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies) + len(errors),
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            name: percentile(latencies, pct) * 1000
+            for name, pct in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay exported conversations and report latency.")
+    parser.add_argument("input", help="JSONL file from conversation_export.py (.gz supported)")
+    parser.add_argument("--llm", choices=["recorded", "fake", "live"], default="recorded")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added per agent call (recorded/fake)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--speed", type=float, default=0.0, help="replay speed-up of recorded timing (0 = no waits)")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many turns")
+    parser.add_argument("--shards", type=int, default=db.SHARD_COUNT, help="shard count of the scratch store")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="chat_replay_")
+    try:
+        chatbot = use_scratch_state(workdir, args.shards)
+        if args.llm == "recorded":
+            chatbot.agent = ReplayAgent(args.llm_latency)
+        elif args.llm == "fake":
+            chatbot.agent = ReplayAgent(args.llm_latency, fixed_reply="Thanks, here is a short follow-up draft.")
+
+        turns_by_user = load_turns(args.input, args.limit)
+        report = replay(chatbot.get_sales_ai_response, turns_by_user, args.concurrency, args.speed)
+    finally:
+        if db.store is not None:
+            db.store.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"📊 Replayed {report['requests']} turn(s) for {len(turns_by_user)} user(s) "
+          f"in {report['elapsed_seconds']:.2f}s ({report['throughput']:.1f} req/s, llm={args.llm})")
+    print("   " + "  ".join(f"{name}={value:.1f}ms" for name, value in report["latency_ms"].items()))
+    if report["errors"]:
+        print(f"❌ {len(report['errors'])} error(s), first: {report['errors'][0]}")
@@ -0,0 +1,111 @@
+# reshard.py
+"""
+Offline tool to move the conversation store to a different number of shards.
+
+Stop the app first, then run e.g.:
+    python reshard.py --from-shards 1 --to-shards 4
+and restart with CHAT_DB_SHARDS=4.
+"""
+import argparse
+import os
+import sqlite3
+
+from db import DB_PATH, init_schema, shard_for_user, shard_path
+
+STAGING_SUFFIX = ".reshard"
+BACKUP_SUFFIX = ".reshard-backup"
+
+
+def _sidecar_files(path: str):
+    return [path, f"{path}-wal", f"{path}-shm"]
+
+
+def _remove(path: str):
+    for file in _sidecar_files(path):
+        if os.path.exists(file):
+            os.remove(file)
+
+
+def _backup(path: str):
+    """Move a checkpointed source shard aside; its WAL files hold nothing after TRUNCATE."""
+    _remove(path + BACKUP_SUFFIX)
+    os.replace(path, path + BACKUP_SUFFIX)
+    for file in _sidecar_files(path)[1:]:
+        if os.path.exists(file):
+            os.remove(file)
+
+
+def reshard(from_shards: int, to_shards: int, base_path: str = DB_PATH, batch_size: int = 500) -> dict:
+    """Copy every conversation into its new shard and swap the files in place."""
+    source_paths = [shard_path(i, from_shards, base_path) for i in range(from_shards)]
+    target_paths = [shard_path(i, to_shards, base_path) for i in range(to_shards)]
+
+    missing = [path for path in source_paths if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing source shard(s): {', '.join(missing)}")
+
+    # Build the new layout next to the old one so a failure leaves the old files untouched
+    targets = []
+    for path in target_paths:
+        _remove(path + STAGING_SUFFIX)
+        conn = sqlite3.connect(path + STAGING_SUFFIX)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        init_schema(conn)
+        targets.append(conn)
+
+    moved = [0] * to_shards
+    try:
+        for path in source_paths:
+            source = sqlite3.connect(path)
+            # Fold any WAL content into the main file before reading and deleting it
+            source.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            init_schema(source)
+            # Any target may receive rows written with any of the source's dictionaries
+            for (dict_id,) in source.execute("SELECT dict_id FROM payload_dictionaries").fetchall():
+                for conn in targets:
+                    conn.execute("INSERT OR IGNORE INTO payload_dictionaries (dict_id) VALUES (?)", (dict_id,))
+            cursor = source.execute("SELECT user_id, messages, timestamp FROM conversations ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for user_id, messages, timestamp in rows:
+                    index = shard_for_user(user_id, to_shards)
+                    targets[index].execute(
+                        "INSERT INTO conversations (user_id, messages, timestamp) VALUES (?, ?, ?)",
+                        (user_id, messages, timestamp)
+                    )
+                    moved[index] += 1
+            source.close()
+        for conn in targets:
+            conn.commit()
+    finally:
+        for conn in targets:
+            conn.close()
+
+    # Keep the old files until the new layout is fully in place; if this step
+    # fails, the originals are still available under BACKUP_SUFFIX
+    for path in source_paths:
+        _backup(path)
+    for path in target_paths:
+        os.replace(path + STAGING_SUFFIX, path)
+    for path in source_paths:
+        _remove(path + BACKUP_SUFFIX)
+
+    return {"from_shards": from_shards, "to_shards": to_shards, "rows_per_shard": moved}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reshard the conversation store (offline).")
+    parser.add_argument("--from-shards", type=int, required=True, help="current CHAT_DB_SHARDS value")
+    parser.add_argument("--to-shards", type=int, required=True, help="new CHAT_DB_SHARDS value")
+    parser.add_argument("--db-path", default=DB_PATH, help="base database path (CHAT_DB_PATH)")
+    args = parser.parse_args()
+
+    if args.from_shards < 1 or args.to_shards < 1:
+        parser.error("shard counts must be at least 1")
+
+    result = reshard(args.from_shards, args.to_shards, args.db_path)
+    print(f"✅ Resharded {args.from_shards} -> {args.to_shards} shard(s)")
+    for index, count in enumerate(result["rows_per_shard"]):
+        print(f"   {shard_path(index, args.to_shards, args.db_path)}: {count} conversation(s)")